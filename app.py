@@ -1,15 +1,29 @@
 # app.py
 
+import gc
+import hashlib
+import json
+
+import numpy as np
 import streamlit as st
 import pandas as pd
 
 from engine1_text import (
-    extract_text_from_pdf,
+    extract_text_from_bytes,
     engine1_run,
     base_scores_from_text,  # used in repository tab
 )
 from engine2_context import build_context_features
-from engine3_model import predict_approval_probability
+from engine3_model import build_model, predict_approval_probability
+
+# Repository PDFs processed between explicit gc passes during batch runs
+REPO_BATCH_SIZE = 8
+# Upper bound on extracted texts kept in the extraction cache
+EXTRACT_CACHE_ENTRIES = 32
+# Number of variables shown in the Engine 3 "top drivers" table
+TOP_DRIVERS = 12
+# Fixed column schema of the repository table (all Engine 0 & 1 scores are ints)
+REPO_COLS = list(base_scores_from_text("").keys())
 
 # ---------------------------------------------------------
 # Page config
@@ -23,23 +37,67 @@ st.title("Bayes ‘Plan Checker’ System – Prototype")
 st.caption("Engine 0–3 | Multi-document, context-aware planning risk engine")
 
 
+# ---------------------------------------------------------
+# Cached engine wrappers
+# (every widget interaction reruns this script, so repeat calls
+#  with the same inputs should not redo PDF parsing / scoring)
+# ---------------------------------------------------------
+def _file_digest(file_bytes: bytes) -> str:
+    """Content fingerprint of an uploaded file."""
+    return hashlib.blake2b(file_bytes, digest_size=16).hexdigest()
+
+
+@st.cache_data(show_spinner=False, max_entries=EXTRACT_CACHE_ENTRIES)
+def _extract_cached(file_bytes: bytes) -> str:
+    # No text budget: every rulebook feature and Word_Count depend on the whole document
+    return extract_text_from_bytes(file_bytes)
+
+
+@st.cache_data(show_spinner=False)
+def _engine1_cached(ps_text, cr_text, ap_text):
+    return engine1_run(ps_text, cr_text, ap_text)
+
+
+@st.cache_data(show_spinner=False)
+def _context_cached(**ctx):
+    return build_context_features(**ctx)
+
+
+@st.cache_data(show_spinner=False)
+def _dumps_cached(d):
+    return json.dumps(d, indent=2)
+
+
+@st.cache_resource(show_spinner=False)
+def _load_model():
+    # Shared, uncopied model object – built once per process.
+    return build_model()
+
+
+@st.cache_data(show_spinner=False)
+def _predict_cached(X_all):
+    return predict_approval_probability(X_all, model=_load_model())
+
+
 # ---------------------------------------------------------
 # Initialise session state
 # ---------------------------------------------------------
 for key in [
-    "ps_text",
-    "cr_text",
-    "ap_text",
     "ps_scores",
     "cr_scores",
     "doc_features",
     "ctx_features",
     "prediction",
     "repo_df",
+    "engine1_key",
 ]:
     if key not in st.session_state:
         st.session_state[key] = None
 
+# content fingerprint -> repository score row (REPO_COLS order)
+if "seen_hashes" not in st.session_state:
+    st.session_state["seen_hashes"] = {}
+
 
 # ---------------------------------------------------------
 # Tabs for each Engine + Repository
@@ -57,7 +115,8 @@ tab_engine01, tab_engine2, tab_engine3, tab_repo = st.tabs(
 # =========================================================
 # TAB 1 – ENGINE 0 & 1: Documents (Rulebook + Extraction)
 # =========================================================
-with tab_engine01:
+@st.fragment
+def _render_engine01():
     st.header("Engine 0 & 1 – Document analysis")
 
     st.markdown(
@@ -95,25 +154,39 @@ with tab_engine01:
     run_engine01 = st.button("Run Engine 0 & 1 on uploaded documents")
 
     if run_engine01:
+        # Fingerprint of the uploaded set – an unchanged set skips the whole pipeline
+        engine1_key = tuple(
+            _file_digest(f.getvalue()) if f else None
+            for f in (ps_file, cr_file, ap_file)
+        )
+
         if not (ps_file or cr_file):
             st.error("Please upload at least a Planning Statement or a Committee/Officer Report.")
+        elif st.session_state["engine1_key"] == engine1_key:
+            st.info("Documents unchanged – showing the existing Engine 0 & 1 results.")
         else:
             with st.spinner("Reading PDFs and running Engine 0 & 1..."):
-                ps_text = extract_text_from_pdf(ps_file) if ps_file else None
-                cr_text = extract_text_from_pdf(cr_file) if cr_file else None
-                ap_text = extract_text_from_pdf(ap_file) if ap_file else None
+                ps_text = _extract_cached(ps_file.getvalue()) if ps_file else None
+                cr_text = _extract_cached(cr_file.getvalue()) if cr_file else None
+                ap_text = _extract_cached(ap_file.getvalue()) if ap_file else None
 
-                st.session_state["ps_text"] = ps_text
-                st.session_state["cr_text"] = cr_text
-                st.session_state["ap_text"] = ap_text
+                ps_scores, cr_scores, doc_features = _engine1_cached(ps_text, cr_text, ap_text)
 
-                ps_scores, cr_scores, doc_features = engine1_run(ps_text, cr_text, ap_text)
+                # Raw texts are not needed once scored – don't pin them for the session
+                del ps_text, cr_text, ap_text
+                gc.collect()
 
                 st.session_state["ps_scores"] = ps_scores
                 st.session_state["cr_scores"] = cr_scores
                 st.session_state["doc_features"] = doc_features
+                st.session_state["engine1_key"] = engine1_key
 
-            st.success("Engine 0 & 1 completed for this case.")
+            # Other tabs read doc_features, so refresh the whole app, not just this fragment
+            st.session_state["engine01_flash"] = True
+            st.rerun()
+
+    if st.session_state.pop("engine01_flash", False):
+        st.success("Engine 0 & 1 completed for this case.")
 
     # Show results if available
     if st.session_state["doc_features"] is not None:
@@ -141,8 +214,9 @@ with tab_engine01:
             else:
                 st.info("No Committee/Officer Report uploaded.")
 
-            st.markdown("**Aggregated X-variables used by later engines**")
-            st.json(st.session_state["doc_features"])
+            # Rendered as a cached JSON string, only rebuilt when doc_features changes
+            with st.expander("Aggregated X-variables used by later engines", expanded=False):
+                st.code(_dumps_cached(st.session_state["doc_features"]), language="json")
 
         st.markdown("**Spin Index (difference between PS and CR)**")
         spin_index = st.session_state["doc_features"].get("X10_Spin_Index", 0.0)
@@ -151,10 +225,15 @@ with tab_engine01:
         st.info("Upload documents and click the button to run Engine 0 & 1.")
 
 
+with tab_engine01:
+    _render_engine01()
+
+
 # =========================================================
 # TAB 2 – ENGINE 2: Context (Sliders)
 # =========================================================
-with tab_engine2:
+@st.fragment
+def _render_engine2():
     st.header("Engine 2 – Context inputs")
 
     st.markdown(
@@ -217,7 +296,7 @@ with tab_engine2:
         submit_ctx = st.form_submit_button("Save Engine 2 context inputs")
 
     if submit_ctx:
-        ctx_features = build_context_features(
+        ctx_features = _context_cached(
             housing_pressure=housing_pressure,
             tb_status=tb_status,
             plan_age=plan_age,
@@ -226,6 +305,11 @@ with tab_engine2:
             floodzone_level=floodzone_level,
         )
         st.session_state["ctx_features"] = ctx_features
+        # Engine 3 tab reads ctx_features, so refresh the whole app
+        st.session_state["ctx_flash"] = True
+        st.rerun()
+
+    if st.session_state.pop("ctx_flash", False):
         st.success("Context inputs saved for this case.")
 
     if st.session_state["ctx_features"] is not None:
@@ -235,10 +319,15 @@ with tab_engine2:
         st.info("Set and save context inputs to use Engine 2.")
 
 
+with tab_engine2:
+    _render_engine2()
+
+
 # =========================================================
 # TAB 3 – ENGINE 3: Output (Prediction)
 # =========================================================
-with tab_engine3:
+@st.fragment
+def _render_engine3():
     st.header("Engine 3 – Predictive output")
 
     st.markdown(
@@ -266,7 +355,7 @@ with tab_engine3:
             X_all.update(st.session_state["ctx_features"])
 
             with st.spinner("Running Engine 3..."):
-                pred = predict_approval_probability(X_all)
+                pred = _predict_cached(X_all)
 
             st.session_state["prediction"] = pred
             st.success("Engine 3 completed for this case.")
@@ -295,26 +384,27 @@ with tab_engine3:
             st.markdown("---")
             st.markdown("### Coefficients & contributions")
 
-            contrib_rows = pred.get("contributions", [])
-            if contrib_rows:
-                df_contrib = pd.DataFrame(contrib_rows)
-                df_contrib = df_contrib.sort_values(
-                    by="abs_contribution", ascending=False
+            df_contrib = pred.get("contributions")
+            if df_contrib is not None and not df_contrib.empty:
+                # Only the displayed columns, as float32, go to the browser
+                df_display = df_contrib[
+                    ["name", "type", "value", "coefficient", "contribution"]
+                ].astype(
+                    {"value": "float32", "coefficient": "float32", "contribution": "float32"}
                 )
 
+                # Partial selection of the top drivers instead of a full sort
+                abs_contrib = df_contrib["abs_contribution"].to_numpy()
+                k = min(TOP_DRIVERS, len(abs_contrib))
+                idx = np.argpartition(-abs_contrib, k - 1)[:k]
+                idx = idx[np.argsort(-abs_contrib[idx])]
+
                 st.write("Top drivers (by absolute contribution to Z_total):")
-                st.dataframe(
-                    df_contrib.head(12)[
-                        ["name", "type", "value", "coefficient", "contribution"]
-                    ]
-                )
+                st.dataframe(df_display.iloc[idx])
 
+                # Full table in model order (X1…X16, Z1…Z5); sortable in the widget
                 with st.expander("Show all variables and contributions"):
-                    st.dataframe(
-                        df_contrib[
-                            ["name", "type", "value", "coefficient", "contribution"]
-                        ]
-                    )
+                    st.dataframe(df_display)
 
                 st.caption(
                     "Each row shows a variable, its coefficient, its current value for this case, "
@@ -324,10 +414,15 @@ with tab_engine3:
                 st.info("No contribution table available from Engine 3 yet.")
 
 
+with tab_engine3:
+    _render_engine3()
+
+
 # =========================================================
 # TAB 4 – REPOSITORY / BATCH (Prototype)
 # =========================================================
-with tab_repo:
+@st.fragment
+def _render_repo():
     st.header("Repository / Batch processing (prototype)")
 
     st.markdown(
@@ -362,25 +457,49 @@ with tab_repo:
         st.success("Repository table cleared.")
 
     if run_batch and repo_files:
-        all_rows = []
+        case_ids = [f.name for f in repo_files]
+        mat = np.empty((len(repo_files), len(REPO_COLS)), dtype=np.int32)
+
+        # Skip PDFs whose content was already scored (re-uploads, duplicates in
+        # this batch): group row indices by content fingerprint
+        seen = st.session_state["seen_hashes"]
+        pending = {}
+        for i, f in enumerate(repo_files):
+            h = _file_digest(f.getvalue())
+            if h in seen:
+                mat[i] = seen[h]
+            else:
+                pending.setdefault(h, []).append(i)
+
         with st.spinner("Running Engine 0 & 1 in batch for all uploaded PDFs..."):
-            for f in repo_files:
-                text = extract_text_from_pdf(f)
+            # PDFium extraction is serialised (it is not thread-safe), so a thread
+            # pool gains nothing here. Parse one PDF at a time (beyond the bounded
+            # extraction cache, one text is alive), collecting every REPO_BATCH_SIZE files.
+            for n, (h, rows) in enumerate(pending.items(), start=1):
+                text = _extract_cached(repo_files[rows[0]].getvalue())
                 scores = base_scores_from_text(text)
-                row = {
-                    "CaseID": f.name,
-                    **scores,
-                }
-                all_rows.append(row)
+                seen[h] = [scores[c] for c in REPO_COLS]
+                mat[rows] = seen[h]
+
+                del text
+                if n % REPO_BATCH_SIZE == 0:
+                    gc.collect()
 
-        if all_rows:
-            df_repo = pd.DataFrame(all_rows)
-            st.session_state["repo_df"] = df_repo
-            st.success("Repository table updated from uploaded documents.")
+        # Stored at full int64 width – this frame is the future regression dataset
+        df_repo = pd.DataFrame(mat, columns=REPO_COLS, dtype=np.int64)
+        df_repo.insert(0, "CaseID", case_ids)
+        st.session_state["repo_df"] = df_repo
+        st.success("Repository table updated from uploaded documents.")
 
     if st.session_state["repo_df"] is not None:
         st.subheader("Current repository (Engine 0 & 1 features per case)")
-        st.dataframe(st.session_state["repo_df"])
+        # Display copy only: smallest integer type per column (scores fit in int8)
+        df_repo = st.session_state["repo_df"]
+        st.dataframe(
+            df_repo.astype(
+                {c: pd.to_numeric(df_repo[c], downcast="integer").dtype for c in REPO_COLS}
+            )
+        )
         st.caption(
             "This is a prototype repository. In a future stage, we could attach outcomes "
             "and use this as the basis for a real data-trained logistic regression model."
@@ -388,3 +507,6 @@ with tab_repo:
     else:
         st.info("No repository table yet. Upload multiple PDFs and run the batch engine.")
 
+
+with tab_repo:
+    _render_repo()
@@ -6,7 +6,10 @@ NPPF 기반 심각도/혜택 점수를 숫자로 바꾸는 규칙 모음.
 """
 
 from dataclasses import dataclass
-from typing import Dict, List
+from functools import lru_cache
+from typing import Dict, List, Set, Union
+
+import ahocorasick
 
 
 @dataclass
@@ -52,14 +55,59 @@ SOCIAL_BENEFIT_WORDS = ["affordable housing", "public open space", "community fa
 POLICY_COMPLIANCE_POS = ["accords with policy", "complies with policy", "in accordance with policy"]
 POLICY_COMPLIANCE_NEG = ["contrary to policy", "conflicts with policy", "non-compliant"]
 
+# Green Belt / Flood 플래그 (점수화는 Engine 1에서, 매칭은 같은 automaton으로)
+GREEN_BELT_PATTERNS = ["green belt", "very special circumstances"]
+FLOOD_PATTERNS = ["flood zone 3", "flood zone 2", "flood risk"]
+
+
+def _all_patterns() -> List[str]:
+    patterns: List[str] = []
+    for scales in (HERITAGE_SCALES, AMENITY_HARM_PATTERNS, ECOLOGY_SCALES):
+        for s in scales:
+            patterns.extend(s.patterns)
+    patterns.extend(DESIGN_POSITIVE + DESIGN_GOOD + DESIGN_NEGATIVE)
+    patterns.extend(ECON_BENEFIT_WORDS + SOCIAL_BENEFIT_WORDS)
+    patterns.extend(POLICY_COMPLIANCE_POS + POLICY_COMPLIANCE_NEG)
+    patterns.extend(GREEN_BELT_PATTERNS + FLOOD_PATTERNS)
+    return patterns
+
+
+@lru_cache(maxsize=None)
+def _rulebook() -> ahocorasick.Automaton:
+    """
+    전체 rulebook 패턴용 Aho-Corasick automaton.
+    프로세스당 한 번만 생성되고 모든 세션/rerun이 같은 객체를 공유.
+    """
+    automaton = ahocorasick.Automaton()
+    for p in set(_all_patterns()):
+        automaton.add_word(p, p)
+    automaton.make_automaton()
+    return automaton
+
 
-def simple_keyword_score(text: str, patterns: List[str]) -> int:
-    t = text.lower()
+def match_patterns(t: str) -> Set[str]:
+    """
+    소문자 텍스트 t를 한 번만 훑어서 등장하는 rulebook 패턴 집합 반환.
+    (패턴마다 `p in t`로 K번 스캔하는 대신 Aho-Corasick 한 번)
+    automaton은 대소문자를 구분하므로 문서당 lower() 한 번은 필요 –
+    패턴별 re.IGNORECASE 검색보다 훨씬 빠름 (lower()는 스캔 비용의 몇 % 수준).
+    """
+    return {p for _, p in _rulebook().iter(t)}
+
+
+def simple_keyword_score(t: Union[str, Set[str]], patterns: List[str]) -> int:
+    """
+    t: 소문자로 변환된 텍스트 또는 match_patterns() 결과 집합.
+    (여기서는 lower()를 하지 않음 – 원문을 그대로 넘기면 대문자 패턴이 누락됨)
+    """
     return sum(1 for p in patterns if p in t)
 
 
-def apply_scales(text: str, scales: List[Scale], default: int = 0) -> int:
-    t = text.lower()
+def apply_scales(t: Union[str, Set[str]], scales: List[Scale], default: int = 0) -> int:
+    """
+    t: 소문자로 변환된 텍스트 또는 match_patterns() 결과 집합.
+    (여기서는 lower()를 하지 않음 – 원문을 그대로 넘기면 대문자 패턴이 누락됨)
+    """
     best = default
     for s in scales:
         if any(p in t for p in s.patterns):
@@ -79,32 +127,38 @@ def rulebook_scores(text: str) -> Dict[str, int]:
     - X9 Policy_Compliance
     나머지는 Engine 1/2에서 추가로 세팅.
     """
-    t = text.lower()
+    return rulebook_scores_from_matches(match_patterns(text.lower()))
+
 
-    heritage_harm = apply_scales(t, HERITAGE_SCALES, default=0)
+def rulebook_scores_from_matches(found: Set[str]) -> Dict[str, int]:
+    """
+    rulebook_scores와 동일 – match_patterns() 결과 집합용
+    (한 번의 스캔 결과를 Engine 1의 다른 플래그와 함께 재사용하기 위함).
+    """
+    heritage_harm = apply_scales(found, HERITAGE_SCALES, default=0)
 
     # Design
     design_quality = 0
-    if any(p in t for p in DESIGN_POSITIVE):
+    if any(p in found for p in DESIGN_POSITIVE):
         design_quality = 3
-    elif any(p in t for p in DESIGN_GOOD):
+    elif any(p in found for p in DESIGN_GOOD):
         design_quality = 1
-    if any(p in t for p in DESIGN_NEGATIVE):
+    if any(p in found for p in DESIGN_NEGATIVE):
         design_quality = min(design_quality - 2, -3)
 
     # Amenity
-    amenity_harm = apply_scales(t, AMENITY_HARM_PATTERNS, default=0)
+    amenity_harm = apply_scales(found, AMENITY_HARM_PATTERNS, default=0)
 
     # Ecology
-    ecology_harm = apply_scales(t, ECOLOGY_SCALES, default=0)
+    ecology_harm = apply_scales(found, ECOLOGY_SCALES, default=0)
 
     # Economic / Social benefit
-    econ_benefit = min(3, simple_keyword_score(t, ECON_BENEFIT_WORDS))
-    social_benefit = min(3, simple_keyword_score(t, SOCIAL_BENEFIT_WORDS))
+    econ_benefit = min(3, simple_keyword_score(found, ECON_BENEFIT_WORDS))
+    social_benefit = min(3, simple_keyword_score(found, SOCIAL_BENEFIT_WORDS))
 
     # Policy compliance
-    pc_pos = simple_keyword_score(t, POLICY_COMPLIANCE_POS)
-    pc_neg = simple_keyword_score(t, POLICY_COMPLIANCE_NEG)
+    pc_pos = simple_keyword_score(found, POLICY_COMPLIANCE_POS)
+    pc_neg = simple_keyword_score(found, POLICY_COMPLIANCE_NEG)
     policy_compliance = max(min(pc_pos - pc_neg, 3), -3)
 
     return {
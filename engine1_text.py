@@ -1,40 +1,86 @@
 # engine1_text.py
+import threading
+from io import BytesIO
 from typing import Dict, Any, Tuple, Optional
+import pypdfium2 as pdfium
 from pypdf import PdfReader
 
-from engine0_rulebook import rulebook_scores
+from engine0_rulebook import match_patterns, rulebook_scores_from_matches
 
 
-def extract_text_from_pdf(uploaded_file) -> str:
-    reader = PdfReader(uploaded_file)
+# PDFium은 thread-safe하지 않음 – 프로세스 전체에서 PDFium 호출은 한 번에 하나만
+_PDFIUM_LOCK = threading.Lock()
+
+
+def _text_pdfium(data: bytes, max_chars: Optional[int] = None) -> str:
+    with _PDFIUM_LOCK:
+        pdf = pdfium.PdfDocument(data)
+        try:
+            text = ""
+            for page in pdf:
+                textpage = page.get_textpage()
+                text += textpage.get_text_range().replace("\r\n", "\n") + "\n"
+                textpage.close()
+                page.close()
+                if max_chars is not None and len(text) >= max_chars:
+                    break
+            return text
+        finally:
+            pdf.close()
+
+
+def _text_pypdf(data: bytes, max_chars: Optional[int] = None) -> str:
+    reader = PdfReader(BytesIO(data))
     text = ""
     for page in reader.pages:
         text += (page.extract_text() or "") + "\n"
+        if max_chars is not None and len(text) >= max_chars:
+            break
     return text
 
 
+def extract_text_from_pdf(uploaded_file, max_chars: Optional[int] = None) -> str:
+    # PdfReader처럼 stream 위치와 무관하게 처음부터 읽음
+    uploaded_file.seek(0)
+    return extract_text_from_bytes(uploaded_file.read(), max_chars=max_chars)
+
+
+def extract_text_from_bytes(data: bytes, max_chars: Optional[int] = None) -> str:
+    """
+    PDF raw bytes에서 텍스트 추출.
+    PDFium(C++) 추출기를 먼저 쓰고, 암호화/손상 PDF라 실패하면 pypdf로 fallback.
+    max_chars: 지정하면 페이지 단위로 읽다가 누적 글자 수가 넘는 순간 중단
+    (긴 PDF의 나머지 페이지는 파싱하지 않음).
+    """
+    try:
+        return _text_pdfium(data, max_chars)
+    except pdfium.PdfiumError:
+        return _text_pypdf(data, max_chars)
+
+
 def base_scores_from_text(text: str) -> Dict[str, Any]:
     """
     Engine 0 rulebook 점수 + flood, GB 등 추가 플래그.
     """
-    base = rulebook_scores(text)
-    t = text.lower()
+    # rulebook + GB/flood 패턴을 한 번의 스캔으로 매칭하고 결과 집합을 재사용
+    found = match_patterns(text.lower())
+    base = rulebook_scores_from_matches(found)
 
     # X5 Green Belt Harm (rough)
     gb_harm = 0
-    if "green belt" in t:
+    if "green belt" in found:
         gb_harm = -2  # GB에서 개발 자체가 harm 가정
-        if "very special circumstances" in t:
+        if "very special circumstances" in found:
             gb_harm = -1
     base["GB_Harm"] = gb_harm
 
     # X6 Flood risk (0~3)
     flood_risk = 0
-    if "flood zone 3" in t:
+    if "flood zone 3" in found:
         flood_risk = 3
-    elif "flood zone 2" in t:
+    elif "flood zone 2" in found:
         flood_risk = 2
-    elif "flood risk" in t:
+    elif "flood risk" in found:
         flood_risk = 1
     base["Flood_Risk"] = flood_risk
 
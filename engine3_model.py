@@ -1,7 +1,10 @@
 # engine3_model.py
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 import math
 
+import numpy as np
+import pandas as pd
+
 
 def _sigmoid(x: float) -> float:
     return 1.0 / (1.0 + math.exp(-x))
@@ -37,15 +40,11 @@ def build_interactions(X: Dict[str, Any]) -> Dict[str, float]:
     return z
 
 
-def predict_approval_probability(X_all: Dict[str, Any]) -> Dict[str, Any]:
+def build_model() -> Dict[str, Any]:
     """
-    X_all: Engine 1 + Engine 2 feature 합친 것 (X1~X16 + Spin_Index 포함)
-    로지스틱 형태 수식으로 승인 확률 계산.
+    Engine 3 모델 계수 (β, γ, intercept) 묶음.
+    데모용 가중치 – 나중에 실제 회귀 결과 로딩으로 대체 가능.
     """
-
-    Z = build_interactions(X_all)
-
-    # ---- 가중치 (데모용, 나중에 실제 회귀로 대체 가능) ----
     beta = {
         "X1_Heritage_Harm": -0.6,
         "X2_Design_Quality": 0.4,
@@ -73,13 +72,44 @@ def predict_approval_probability(X_all: Dict[str, Any]) -> Dict[str, Any]:
         "Z5_GB_x_Housing": 0.15,
     }
 
-    intercept = -0.5
+    # β와 γ를 하나의 정렬된 계수 벡터로 (β·X를 dot product 한 번으로 계산)
+    names = list(beta) + list(gamma)
+    types = ["X"] * len(beta) + ["Z"] * len(gamma)
+    coefficients = np.array(list(beta.values()) + list(gamma.values()), dtype=np.float64)
+
+    return {
+        "intercept": -0.5,
+        "names": names,
+        "types": types,
+        "coefficients": coefficients,
+    }
+
+
+def predict_approval_probability(
+    X_all: Dict[str, Any],
+    model: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    """
+    X_all: Engine 1 + Engine 2 feature 합친 것 (X1~X16 + Spin_Index 포함)
+    model: build_model() 결과 (없으면 새로 생성)
+    로지스틱 형태 수식으로 승인 확률 계산.
+    """
+    if model is None:
+        model = build_model()
+
+    Z = build_interactions(X_all)
+
+    names = model["names"]
+    coef = model["coefficients"]
+    features = {**X_all, **Z}
+    x = np.fromiter(
+        (float(features.get(n, 0.0)) for n in names),
+        dtype=np.float64,
+        count=len(names),
+    )
 
-    z_linear = intercept
-    for k, v in beta.items():
-        z_linear += v * float(X_all.get(k, 0.0))
-    for k, v in gamma.items():
-        z_linear += v * float(Z.get(k, 0.0))
+    contrib = coef * x
+    z_linear = float(model["intercept"] + contrib.sum())
 
     prob = _sigmoid(z_linear)
     prob = max(0.0, min(1.0, prob))
@@ -97,4 +127,14 @@ def predict_approval_probability(X_all: Dict[str, Any]) -> Dict[str, Any]:
         "rating": rating,
         "linear_score": z_linear,
         "interactions": Z,
+        "contributions": pd.DataFrame(
+            {
+                "name": names,
+                "type": model["types"],
+                "value": x,
+                "coefficient": coef,
+                "contribution": contrib,
+                "abs_contribution": np.abs(contrib),
+            }
+        ),
     }